@@ -1,11 +1,21 @@
+import csv
+import functools
 import logging
 import json
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, Any, Union
+from typing import Optional, Dict, Any, List, Tuple, Union
 from io import BytesIO
 
+import fitz
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
+import pytesseract
 from reportlab.pdfgen import canvas
+from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from pypdf import PdfReader, PdfWriter
 
@@ -50,8 +60,14 @@ def load_config(config_path: Optional[Union[str, Path]]) -> Dict[str, Any]:
 
 
 # --- Font Loader ---
+@functools.lru_cache(maxsize=None)
 def get_font(size: int, font_path: Optional[str] = None) -> ImageFont.ImageFont:
-    """Try to load a TTF font, fall back to default."""
+    """Try to load a TTF font, fall back to default.
+
+    Cached: ImageFont.truetype re-reads and re-parses the font file on
+    every call, and annotations reuse the same handful of (path, size)
+    combinations.
+    """
     try:
         if font_path:
             return ImageFont.truetype(font_path, size)
@@ -60,6 +76,37 @@ def get_font(size: int, font_path: Optional[str] = None) -> ImageFont.ImageFont:
     return ImageFont.load_default()
 
 
+@functools.lru_cache(maxsize=None)
+def _color_rgb(name: str) -> Tuple[float, float, float]:
+    """Resolve an annotation color name to an RGB triple, once per name.
+
+    Configs repeat the same few colors across every annotation on every
+    page, so parsing is memoized. Unknown names fall back to black, as the
+    old inline mapping did.
+    """
+    try:
+        color = colors.toColor(name.lower())
+        return (color.red, color.green, color.blue)
+    except ValueError:
+        logger.warning(f"Unknown color '{name}', using black")
+        return (0.0, 0.0, 0.0)
+
+
+@functools.lru_cache(maxsize=4096)
+def _glyph_mask(font_path: Optional[str], size: int, text: str) -> Image.Image:
+    """Render `text` once into an L-mode mask.
+
+    FreeType re-shapes and re-rasterizes glyphs on every draw.text call;
+    caching the mask turns repeated stamps (SAMPLE, dates, signatures) into
+    a plain paste.
+    """
+    font = get_font(size, font_path)
+    bbox = font.getbbox(text)
+    mask = Image.new("L", (max(bbox[2], 1), max(bbox[3], 1)), 0)
+    ImageDraw.Draw(mask).text((0, 0), text, fill=255, font=font)
+    return mask
+
+
 # --- Image Annotation ---
 def annotate_image(
     input_file: Union[str, Path],
@@ -78,9 +125,7 @@ def annotate_image(
         except Exception as e:
             logger.error(f"DeepDoctection analysis failed for image: {e}")
 
-    draw = ImageDraw.Draw(img)
     for ann in config.get("annotations", []):
-        font = get_font(ann.get("size", 12), ann.get("font"))
         color = ann.get("color", "red")
         text = ann["text"]
 
@@ -110,92 +155,397 @@ def annotate_image(
             else:
                 logger.warning(f"Field '{ann['field']}' not found, using default coords")
         
-        draw.text((x, y), text, fill=color, font=font)
+        # Paste the cached glyph mask instead of re-rasterizing the text
+        mask = _glyph_mask(ann.get("font"), ann.get("size", 12), text)
+        img.paste(color, (int(x), int(y)), mask)
 
     img.save(output_file)
     logger.info(f"Annotated image saved to {output_file}")
 
 
+# --- OCR Helpers ---
+# One persistent tesseract API per process: created lazily so each pool
+# worker gets its own instance. Not safe to share across threads.
+_TESS_API = None
+
+
+def _get_tess_api():
+    """Lazily initialize this process's persistent tesserocr API."""
+    global _TESS_API
+    if _TESS_API is None:
+        from tesserocr import PyTessBaseAPI
+        _TESS_API = PyTessBaseAPI(lang="eng")
+    return _TESS_API
+
+
+# Longest page side fed to tesseract; its LSTM cost scales with pixel
+# count and word boxes don't need more resolution than this
+_OCR_MAX_DIM = 2000
+
+
+def _have_tesserocr() -> bool:
+    try:
+        import tesserocr  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _prepare_ocr_image(image: np.ndarray) -> Tuple[Image.Image, float]:
+    """Downscale and binarize a page raster for OCR.
+
+    Returns the prepared PIL image and the factor to scale recognized boxes
+    back into the original raster's pixel space. The image is reduced to at
+    most `_OCR_MAX_DIM` on the longest side, then binarized to L mode
+    around its mean gray level — a third of the bytes of RGB, tesseract
+    skips its own grayscale conversion, and the adaptive cut survives dark
+    or low-contrast scans that a fixed threshold would wash out.
+    """
+    pil_image = Image.fromarray(image)
+    scale = max(pil_image.size) / _OCR_MAX_DIM
+    if scale > 1.0:
+        pil_image = pil_image.resize(
+            (round(pil_image.width / scale), round(pil_image.height / scale))
+        )
+    else:
+        scale = 1.0
+    gray = pil_image.convert("L")
+    threshold = float(np.asarray(gray).mean())
+    pil_image = gray.point(lambda p: 255 if p > threshold else 0)
+    return pil_image, scale
+
+
+def _ocr_words(image: np.ndarray) -> List[Tuple[str, Tuple[int, int, int, int]]]:
+    """Run OCR once over a page image.
+
+    `image` is an (H, W, N) uint8 array; boxes come back in its pixel
+    space. Uses a persistent tesserocr API so the tesseract model is loaded
+    once per process instead of fork/exec'ing the binary for every call;
+    falls back to pytesseract when tesserocr is not installed. Returns
+    (lowercased word, (left, top, width, height)) pairs.
+    """
+    pil_image, scale = _prepare_ocr_image(image)
+
+    words = []
+
+    try:
+        from tesserocr import RIL, iterate_level
+        api = _get_tess_api()
+    except ImportError:
+        api = None
+
+    if api is None:
+        # pytesseract spawns a tesseract process per call; slower, but works
+        data = pytesseract.image_to_data(pil_image, output_type=pytesseract.Output.DICT)
+        for i, word in enumerate(data["text"]):
+            if word:
+                words.append((word.lower(), (data["left"][i], data["top"][i], data["width"][i], data["height"][i])))
+    else:
+        api.SetImage(pil_image)
+        api.Recognize()
+        ri = api.GetIterator()
+        if ri is not None:
+            for it in iterate_level(ri, RIL.WORD):
+                word = it.GetUTF8Text(RIL.WORD)
+                if word:
+                    x1, y1, x2, y2 = it.BoundingBox(RIL.WORD)
+                    words.append((word.lower(), (x1, y1, x2 - x1, y2 - y1)))
+
+    if scale != 1.0:
+        words = [
+            (word, tuple(round(v * scale) for v in box)) for word, box in words
+        ]
+    return words
+
+
+def _ocr_words_batch(images: List[np.ndarray]) -> List[List[Tuple[str, Tuple[int, int, int, int]]]]:
+    """OCR a batch of page images with one tesseract invocation.
+
+    The tesseract binary accepts a text file listing one image path per
+    line and tags its TSV output with page_num, so N pages cost a single
+    process spawn and model load instead of N. Used when tesserocr is not
+    installed and per-page `_ocr_words` calls would each fork a process.
+    """
+    results: List[List[Tuple[str, Tuple[int, int, int, int]]]] = [[] for _ in images]
+    if not images:
+        return results
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        scales = []
+        list_path = os.path.join(tmp_dir, "list_of_images.txt")
+        with open(list_path, "w", encoding="utf-8") as listing:
+            for i, image in enumerate(images):
+                pil_image, scale = _prepare_ocr_image(image)
+                scales.append(scale)
+                image_path = os.path.join(tmp_dir, f"page_{i:04d}.png")
+                pil_image.save(image_path)
+                listing.write(image_path + "\n")
+
+        output_base = os.path.join(tmp_dir, "ocr")
+        subprocess.run(
+            [pytesseract.pytesseract.tesseract_cmd, list_path, output_base, "tsv"],
+            check=True,
+            capture_output=True,
+        )
+
+        with open(output_base + ".tsv", encoding="utf-8") as f:
+            for row in csv.DictReader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+                word = (row.get("text") or "").strip()
+                if not word:
+                    continue
+                page_index = int(row["page_num"]) - 1
+                scale = scales[page_index]
+                box = tuple(
+                    round(int(row[key]) * scale)
+                    for key in ("left", "top", "width", "height")
+                )
+                results[page_index].append((word.lower(), box))
+    return results
+
+
+def _text_layer_words(fitz_page) -> List[Tuple[str, Tuple[int, int, int, int]]]:
+    """Extract word boxes from a page's embedded text layer, if any.
+
+    Born-digital PDFs carry their text as content-stream operators, so
+    running OCR on a rasterized copy is pure waste. PyMuPDF's "words"
+    extraction returns exact, transform-aware boxes in PDF points with a
+    top-left origin — the same (left, top, width, height) convention
+    `_ocr_words` uses. Returns an empty list for scanned pages.
+    """
+    words: List[Tuple[str, Tuple[int, int, int, int]]] = []
+    try:
+        extracted = fitz_page.get_text("words")
+    except Exception as e:
+        logger.warning(f"Text layer extraction failed: {e}")
+        return []
+    for x0, y0, x1, y1, word, *_ in extracted:
+        word = word.strip().lower()
+        if word:
+            words.append((word, (round(x0), round(y0), round(x1 - x0), round(y1 - y0))))
+    return words
+
+
+def _word_tokens(words) -> np.ndarray:
+    """Materialize a page's OCR tokens as a numpy string array for
+    vectorized containment scans."""
+    return np.array([word for word, _ in words]) if words else np.empty(0, dtype="U1")
+
+
+def _lookup_positions(words, tokens, target: str) -> List[Tuple[int, int, int, int]]:
+    """Find boxes for every word containing `target`, in page order.
+
+    The containment check runs as one vectorized np.char.find over all
+    tokens instead of a Python loop. Pure substring semantics, matching
+    the original per-call OCR lookup.
+    """
+    hits = np.flatnonzero(np.char.find(tokens, target.lower()) >= 0)
+    return [words[i][1] for i in hits]
+
+
+def _match_all_targets(words, targets: List[str]) -> Dict[str, List[Tuple[int, int, int, int]]]:
+    """Locate every target's boxes in one pass over a page's OCR tokens.
+
+    With pyahocorasick installed, all patterns compile into a single
+    automaton and each token is scanned once no matter how many targets the
+    config defines; without it, each target runs its own containment scan.
+    Both paths return the same boxes in the same order — every word
+    containing the target, in page order — so installing the optional
+    speed extra never moves an annotation. Returns a dict of lowercased
+    target -> boxes.
+    """
+    targets = [target.lower() for target in targets]
+
+    try:
+        import ahocorasick
+    except ImportError:
+        tokens = _word_tokens(words)
+        return {target: _lookup_positions(words, tokens, target) for target in targets}
+
+    automaton = ahocorasick.Automaton()
+    for target in set(targets):
+        automaton.add_word(target, target)
+    automaton.make_automaton()
+
+    positions: Dict[str, List[Tuple[int, int, int, int]]] = {target: [] for target in targets}
+    for word, box in words:
+        # A word containing a target more than once still contributes its
+        # box a single time, exactly like the containment scan
+        hit = set()
+        for _, target in automaton.iter(word):
+            if target not in hit:
+                positions[target].append(box)
+                hit.add(target)
+    return positions
+
+
+def find_text_positions(image: np.ndarray, target: str) -> List[Tuple[int, int, int, int]]:
+    """Locate words containing `target` in a page image using OCR.
+
+    Convenience wrapper for one-off lookups; `_render_page` caches the OCR
+    pass per page and queries it for every annotation instead.
+    """
+    words = _ocr_words(image)
+    return _lookup_positions(words, _word_tokens(words), target)
+
+
+# Overlay scratch buffer, reused across every page a process renders so
+# each overlay is a truncate/refill instead of a fresh allocation
+_PACKET = BytesIO()
+
+
+def _ann_target(ann: Dict[str, Any]) -> Optional[str]:
+    """Text an annotation wants located on the page, if any.
+
+    'match' is the native key; 'field' is honored too so PDF configs
+    written for the old deepdoctection pass (like the shipped config.json)
+    keep their OCR placement instead of silently falling back to default
+    coordinates.
+    """
+    return ann.get("match", ann.get("field"))
+
+
+def _render_page(args) -> bytes:
+    """Worker: render the overlay PDF for a single page and return its bytes.
+
+    Runs in a separate process; OCR for 'match' annotations happens here so
+    pages are processed in parallel.
+    """
+    image, page_size, annotations, words = args
+    page_width, page_height = page_size
+    # OCR coordinates are in image pixels; the overlay is in PDF points.
+    # `image` is None when no annotation needs OCR placement.
+    scale_x = page_width / image.shape[1] if image is not None else 1.0
+    scale_y = page_height / image.shape[0] if image is not None else 1.0
+
+    # OCR the page once and resolve every 'match' target against it in a
+    # single multi-pattern pass, rather than re-running tesseract (or
+    # re-scanning the tokens) per annotation. The parent may have already
+    # batch-OCR'd the page (pytesseract listfile path).
+    targets = [target for target in map(_ann_target, annotations) if target is not None]
+    if words is None:
+        words = _ocr_words(image) if targets else []
+    positions_by_target = _match_all_targets(words, targets) if targets else {}
+
+    packet = _PACKET
+    packet.seek(0)
+    packet.truncate(0)
+    c = canvas.Canvas(packet, pagesize=(page_width, page_height))
+    # One text object for the whole page: each drawString would emit its
+    # own BT/ET block and re-encode state, a textObject batches them
+    text_object = c.beginText()
+
+    for ann in annotations:
+        color = ann.get("color", "red")
+        text = ann["text"]
+
+        x, y = ann.get("x", 50), ann.get("y", 50) # Default to manual placement
+
+        target = _ann_target(ann)
+        if target is not None:
+            positions = positions_by_target.get(target.lower(), [])
+            if positions:
+                left, top, _, _ = positions[0]
+                x = left * scale_x + ann.get("offset_x", 0)
+                # Convert image top-left y to ReportLab bottom-left y
+                y = page_height - (top * scale_y + ann.get("offset_y", 0))
+            else:
+                logger.warning(f"Match '{target}' not found, using default coords")
+                y = page_height - y
+        else:
+            # Convert top-left y to ReportLab bottom-left y for manual placement
+            y = page_height - y
+
+        text_object.setFont("Helvetica", ann.get("size", 12))
+        text_object.setFillColorRGB(*_color_rgb(color))
+        text_object.setTextOrigin(x, y)
+        text_object.textOut(text)
+
+    c.drawText(text_object)
+    c.save()
+    return packet.getvalue()
+
+
 # --- PDF Annotation ---
 def annotate_pdf(
     input_file: Union[str, Path],
     output_file: Union[str, Path],
     config: Dict[str, Any],
 ):
-    """Annotate a PDF by overlaying text on each page."""
+    """Annotate a PDF by overlaying text on each page.
+
+    Pages are rasterized once up front, then per-page overlays are rendered
+    in a process pool — OCR dominates the cost and releases the GIL, so this
+    scales near-linearly with core count on multi-page PDFs.
+    """
+    input_file = Path(input_file)
+    # Parse the source PDF exactly once, outside any per-page loop
+    reader = PdfReader(str(input_file))
+    annotations = config.get("annotations", [])
+
+    has_match = any(_ann_target(ann) is not None for ann in annotations)
+    page_sizes = [
+        (float(page.mediabox.width), float(page.mediabox.height))
+        for page in reader.pages
+    ]
+
+    if has_match:
+        # Born-digital pages already carry their text: resolve 'match'
+        # targets from the text layer where one exists — exact boxes in PDF
+        # points — and rasterize in-process with PyMuPDF only the scanned
+        # pages that actually need OCR (no Poppler subprocess, temp files
+        # or PIL re-decode involved).
+        doc = fitz.open(input_file)
+        page_words: List[Optional[list]] = [_text_layer_words(p) or None for p in doc]
+        images: List[Optional[np.ndarray]] = [None] * len(page_words)
+        for i, fitz_page in enumerate(doc):
+            if page_words[i] is None:
+                pix = fitz_page.get_pixmap(dpi=200)
+                # samples copies the pixmap's buffer; a samples_mv view
+                # would dangle once pix is rebound on the next iteration
+                images[i] = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+        doc.close()
+
+        # With tesserocr each pool worker OCRs its pages through a
+        # persistent API. Without it, per-page OCR would spawn one
+        # tesseract process per page — batch the scanned pages through a
+        # single invocation up front instead and hand the workers
+        # ready-made word lists.
+        if not _have_tesserocr():
+            ocr_indices = [i for i, words in enumerate(page_words) if words is None]
+            for i, words in zip(ocr_indices, _ocr_words_batch([images[i] for i in ocr_indices])):
+                page_words[i] = words
+
+        jobs = list(zip(images, page_sizes, [annotations] * len(images), page_words))
+
+        if any(words is None for words in page_words):
+            # Keep tesseract from oversubscribing cores underneath the pool
+            os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                overlays = list(executor.map(_render_page, jobs, chunksize=4))
+        else:
+            # Every page's words are already resolved; rendering overlays
+            # is too cheap to be worth spinning up a pool
+            overlays = [_render_page(job) for job in jobs]
+    else:
+        # Fixed-coordinate annotations make the overlay a pure function of
+        # page size: render one per unique size and reuse the bytes, with
+        # no rasterization or OCR at all
+        overlay_cache: Dict[Tuple[float, float], bytes] = {}
+        overlays = []
+        for page_size in page_sizes:
+            if page_size not in overlay_cache:
+                overlay_cache[page_size] = _render_page((None, page_size, annotations, []))
+            overlays.append(overlay_cache[page_size])
+
     writer = PdfWriter()
-    
-    with open(input_file, "rb") as f_in:
-        reader = PdfReader(f_in)
-        
-        for page_number, page in enumerate(reader.pages):
-            document_obj = None
-            if analyzer:
-                try:
-                    # DeepDoctection can analyze PDF pages directly
-                    # For multi-page PDFs, we might need to pass individual pages or a range
-                    # For simplicity, we'll analyze the whole PDF once and then get page-specific info
-                    # This part needs refinement for page-specific layout detection
-                    if page_number == 0: # Analyze only once for the whole document
-                        document_obj = analyzer.analyze(path=str(input_file))
-                        logger.info("DeepDoctection analysis complete for PDF.")
-                except Exception as e:
-                    logger.error(f"DeepDoctection analysis failed for PDF: {e}")
-
-            # Create an in-memory overlay
-            packet = BytesIO()
-            # ReportLab uses bottom-left origin, so we need to convert PIL top-left y to ReportLab y
-            # Assuming letter size for now, need to get actual page size from PDF
-            page_width = page.mediabox.width
-            page_height = page.mediabox.height
-            c = canvas.Canvas(packet, pagesize=(page_width, page_height))
-
-            # Apply annotations to the canvas
-            # Need to adjust y-coordinates for ReportLab's bottom-left origin
-            # This is a simplified conversion; actual conversion needs to consider font size and text height
-            
-            for ann in config.get("annotations", []):
-                font = get_font(ann.get("size", 12), ann.get("font"))
-                color = ann.get("color", "red")
-                text = ann["text"]
-
-                x, y = ann.get("x", 50), ann.get("y", 50) # Default to manual placement
-
-                if "field" in ann and document_obj:
-                    found_field_box = None
-                    for block in document_obj.get_annotation(category_name="TEXT"):
-                        if ann["field"].lower() in block.text.lower():
-                            found_field_box = block.bounding_box
-                            break
-                    
-                    if found_field_box:
-                        x_field, y_field = found_field_box[0], found_field_box[1]
-                        x = x_field + ann.get("offset_x", 0)
-                        # Convert PIL top-left y to ReportLab bottom-left y
-                        y = page_height - (y_field + ann.get("offset_y", 0))
-                    else:
-                        logger.warning(f"Field '{ann['field']}' not found on page {page_number + 1}, using default coords")
-                else:
-                    # Convert PIL top-left y to ReportLab bottom-left y for manual placement
-                    y = page_height - y
-
-                c.setFont("Helvetica", ann.get("size", 12))
-                if color.lower() == "red": c.setFillColorRGB(1, 0, 0)
-                elif color.lower() == "blue": c.setFillColorRGB(0, 0, 1)
-                else: c.setFillColorRGB(0, 0, 0) # default to black
-                c.drawString(x, y, ann["text"])
-
-            c.save()
-            packet.seek(0)
-
-            # Merge overlay with the existing page
-            overlay_reader = PdfReader(packet)
-            pdf_page = reader.pages[page_number] # Get the original page object
-            pdf_page.merge_page(overlay_reader.pages[0])
-            writer.add_page(pdf_page)
+    for page, overlay in zip(reader.pages, overlays):
+        page.merge_page(PdfReader(BytesIO(overlay)).pages[0])
+        writer.add_page(page)
 
+    # write_stream serializes straight into the open file, skipping
+    # write()'s path handling and duplicate-object scan
     with open(output_file, "wb") as f_out:
-        writer.write(f_out)
+        writer.write_stream(f_out)
 
     logger.info(f"Annotated PDF saved to {output_file}")
 
@@ -208,8 +558,7 @@ def annotate(
 ):
     """Auto-detect input type and apply annotations (DeepDoctection-aware)."""
     if not analyzer:
-        logger.error("DeepDoctection analyzer not initialized. Cannot proceed with annotation.")
-        return
+        logger.warning("DeepDoctection analyzer not initialized; 'field' annotations on images will be skipped.")
 
     config = load_config(config_path)
     input_file = Path(input_file)
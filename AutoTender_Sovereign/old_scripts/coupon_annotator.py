@@ -1,5 +1,7 @@
 import argparse
 import datetime
+import functools
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 import os
 
@@ -9,7 +11,10 @@ from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 
 
+@functools.lru_cache(maxsize=None)
 def get_font(font_name, size):
+    # Cached: truetype re-parses the font file on every load, and the same
+    # few (name, size) pairs are requested for every annotation
     try:
         return ImageFont.truetype(font_name, size)
     except IOError:
@@ -40,12 +45,21 @@ def annotate_image(input_path, output_path, endorsement_lines, signature, x, y):
         box_margin = 20
         draw.rectangle((x - box_margin, y - box_margin, x + max_width + box_margin, y + total_height + box_margin), fill="white")
 
-        # Text layout
-        current_y = y
+        # Text layout: group consecutive lines sharing a font so each run
+        # is a single multiline_text call instead of a draw per line
+        runs = []
         for line in endorsement_lines:
             font_to_use = font_bold if line.startswith("**") else font_regular
-            draw.text((x, current_y), line.replace("**", ""), fill="black", font=font_to_use)
-            current_y += font_regular.getbbox(line)[3] + line_spacing
+            if runs and runs[-1][0] is font_to_use:
+                runs[-1][1].append(line.replace("**", ""))
+            else:
+                runs.append((font_to_use, [line.replace("**", "")]))
+
+        current_y = y
+        for font_to_use, lines in runs:
+            block = "\n".join(lines)
+            draw.multiline_text((x, current_y), block, fill="black", font=font_to_use, spacing=line_spacing)
+            current_y = draw.multiline_textbbox((x, current_y), block, font=font_to_use, spacing=line_spacing)[3] + line_spacing
 
         # Signature
         current_y += line_spacing
@@ -92,24 +106,67 @@ def annotate_pdf(input_path, output_path, endorsement_lines, signature, x, y):
         packet.seek(0)
 
         overlay = PdfReader(packet)
-        existing_pdf = PdfReader(open(input_path, "rb"))
         output = PdfWriter()
 
-        page = existing_pdf.pages[0]
-        page.merge_page(overlay.pages[0])
-        output.add_page(page)
+        with open(input_path, "rb") as f_in:
+            existing_pdf = PdfReader(f_in)
+            page = existing_pdf.pages[0]
+            page.merge_page(overlay.pages[0])
+            output.add_page(page)
 
-        with open(output_path, "wb") as f:
-            output.write(f)
+            with open(output_path, "wb") as f:
+                output.write_stream(f)
         print(f"Successfully annotated PDF and saved to {output_path}")
 
     except Exception as e:
         print(f"An error occurred during PDF annotation: {e}")
 
 
+SUPPORTED_EXTS = (".pdf", ".png", ".jpg", ".jpeg")
+
+
+def annotate_file(input_path, output_path, endorsement_lines, signature, x, y):
+    """
+    Dispatches a single coupon to the PDF or image annotator.
+    """
+    file_ext = os.path.splitext(input_path)[1].lower()
+    if file_ext == ".pdf":
+        # PDF coordinates are from bottom-left, so we need to adjust
+        # This is a simplistic adjustment and may need refinement
+        pdf_y = 800 - y / 2 # A rough conversion
+        annotate_pdf(input_path, output_path, endorsement_lines, signature, x, pdf_y)
+    elif file_ext in (".png", ".jpg", ".jpeg"):
+        annotate_image(input_path, output_path, endorsement_lines, signature, x, y)
+    else:
+        print(f"Error: Unsupported file type '{file_ext}'. Please use a PDF or image file.")
+
+
+def _annotate_one(job):
+    annotate_file(*job)
+
+
+def annotate_directory(input_dir, endorsement_lines, signature, x, y):
+    """
+    Annotates every coupon in a directory, spreading files across a
+    process pool — each coupon is independent, so this scales with cores.
+    """
+    jobs = []
+    for name in sorted(os.listdir(input_dir)):
+        base, ext = os.path.splitext(name)
+        if ext.lower() not in SUPPORTED_EXTS or base.endswith("_annotated"):
+            continue
+        input_path = os.path.join(input_dir, name)
+        output_path = os.path.join(input_dir, f"{base}_annotated{ext}")
+        jobs.append((input_path, output_path, endorsement_lines, signature, x, y))
+
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        list(executor.map(_annotate_one, jobs))
+    print(f"Annotated {len(jobs)} coupon(s) in {input_dir}")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Annotate a bill with a sovereign endorsement.")
-    parser.add_argument("--input", required=True, help="Path to the input bill (PDF or image).")
+    parser.add_argument("--input", required=True, help="Path to the input bill (PDF or image), or a directory of bills.")
     parser.add_argument("--output", help="Path to save the annotated bill. If not provided, defaults to [input]_annotated.[ext]")
     parser.add_argument("--x", type=int, default=100, help="X-coordinate for the top-left of the endorsement block.")
     parser.add_argument("--y", type=int, default=1950, help="Y-coordinate for the top-left of the endorsement block.")
@@ -118,19 +175,12 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    # Determine output path if not provided
-    if not args.output:
-        file_name, file_ext = os.path.splitext(args.input)
-        args.output = f"{file_name}_annotated{file_ext}"
-
-    # Determine file type and annotate
-    file_ext = os.path.splitext(args.input)[1].lower()
-    if file_ext in [".pdf"]:
-        # PDF coordinates are from bottom-left, so we need to adjust
-        # This is a simplistic adjustment and may need refinement
-        pdf_y = 800 - args.y / 2 # A rough conversion
-        annotate_pdf(args.input, args.output, args.lines, args.signature, args.x, pdf_y)
-    elif file_ext in [".png", ".jpg", ".jpeg"]:
-        annotate_image(args.input, args.output, args.lines, args.signature, args.x, args.y)
+    if os.path.isdir(args.input):
+        annotate_directory(args.input, args.lines, args.signature, args.x, args.y)
     else:
-        print(f"Error: Unsupported file type '{file_ext}'. Please use a PDF or image file.")
+        # Determine output path if not provided
+        if not args.output:
+            file_name, file_ext = os.path.splitext(args.input)
+            args.output = f"{file_name}_annotated{file_ext}"
+
+        annotate_file(args.input, args.output, args.lines, args.signature, args.x, args.y)